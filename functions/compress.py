@@ -0,0 +1,215 @@
+### Imports ###
+import io
+import copy
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sklearn.metrics import roc_auc_score
+from sklearn.ensemble import RandomForestClassifier
+
+from .config import MODELS_DIR
+
+
+
+def prune_tree(estimator, max_depth: int):
+    """
+    Returns a copy of a fitted decision tree cut at `max_depth`.
+    Nodes at `max_depth` become leaves, keeping the class distribution already stored for them,
+    and the nodes below are dropped. If the tree is not deeper than `max_depth`, the copy shares its tree.
+    """
+
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    if max_depth >= state["max_depth"]:
+        return copy.copy(estimator)
+
+    # Depth of every node, one level at a time
+    depth = np.full(tree.node_count, -1)
+    frontier = np.array([0])
+    level = 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.concatenate([nodes["left_child"][frontier], nodes["right_child"][frontier]])
+        frontier = children[children >= 0]
+        level += 1
+
+    keep = depth <= max_depth
+    new_index = np.cumsum(keep) - 1
+
+    pruned = nodes[keep].copy()
+    internal = pruned["left_child"] >= 0
+    leaf = internal & (depth[keep] == max_depth)
+    internal &= ~leaf
+
+    pruned["left_child"][internal] = new_index[pruned["left_child"][internal]]
+    pruned["right_child"][internal] = new_index[pruned["right_child"][internal]]
+    pruned["left_child"][leaf] = -1
+    pruned["right_child"][leaf] = -1
+    pruned["feature"][leaf] = -2
+    pruned["threshold"][leaf] = -2
+
+    new_tree = type(tree)(tree.n_features, tree.n_classes, tree.n_outputs)
+    new_tree.__setstate__({"max_depth": max_depth,
+                           "node_count": int(keep.sum()),
+                           "nodes": pruned,
+                           "values": values[keep]})
+
+    new_estimator = copy.copy(estimator)
+    new_estimator.tree_ = new_tree
+
+    return new_estimator
+
+
+class CompressForest:
+    """
+    A class to trade the size and latency of a random forest against its AUC.
+    Candidates keep the first `n_trees` trees of the forest (the trees are i.i.d., so any subset is
+    equivalent) and cut every tree at `max_depth`, without retraining.
+    Args:
+        tree_counts (list): Numbers of trees evaluated, capped at the size of the forest.
+        max_depths (list): Depth limits evaluated, None keeps the full depth.
+        auc_tolerance (float): AUC that can be lost against the full forest.
+        n_repeats (int): Timing repeats, the fastest one is kept.
+    Methods:
+        prune(model, n_trees, max_depth) -> RandomForestClassifier:
+            Builds one candidate.
+        evaluate(model, X, y) -> pd.DataFrame:
+            AUC, model bytes and µs per prediction of every candidate, with the Pareto set flagged.
+        compress(model, X, y, output_path) -> RandomForestClassifier:
+            Saves the smallest candidate within `auc_tolerance` of the full forest.
+    """
+    def __init__(self,
+                 tree_counts: list = [10, 25, 50, 75, 100],
+                 max_depths: list = [4, 6, 8, 10, 12, 16, None],
+                 auc_tolerance: float = 0.005,
+                 n_repeats: int = 3):
+
+        self.tree_counts = tree_counts
+        self.max_depths = max_depths
+        self.auc_tolerance = auc_tolerance
+        self.n_repeats = n_repeats
+        self.results = None
+
+    def prune(self,
+              model: RandomForestClassifier,
+              n_trees: int,
+              max_depth: int | None) -> RandomForestClassifier:
+        """
+        Returns a copy of the forest with its first `n_trees` trees, each cut at `max_depth`.
+        """
+
+        estimators = model.estimators_[:n_trees]
+        if max_depth is not None:
+            estimators = [prune_tree(estimator, max_depth) for estimator in estimators]
+
+        candidate = copy.copy(model)
+        candidate.estimators_ = estimators
+        candidate.n_estimators = len(estimators)
+        if max_depth is not None:
+            candidate.max_depth = max_depth if model.max_depth is None else min(model.max_depth, max_depth)
+
+        return candidate
+
+    def _measure(self, candidate: RandomForestClassifier, X: pd.DataFrame, y) -> dict:
+        """
+        AUC on the holdout, size of the joblib dump and best time per prediction.
+        """
+
+        timings = []
+        for _ in range(self.n_repeats):
+            start = time.perf_counter()
+            y_proba = candidate.predict_proba(X)[:, 1]
+            timings.append(time.perf_counter() - start)
+
+        buffer = io.BytesIO()
+        joblib.dump(candidate, buffer)
+
+        return {"auc": roc_auc_score(y, y_proba),
+                "model_bytes": buffer.getbuffer().nbytes,
+                "us_per_prediction": min(timings) / len(X) * 1e6}
+
+    def evaluate(self,
+                 model: RandomForestClassifier,
+                 X: pd.DataFrame,
+                 y) -> pd.DataFrame:
+        """
+        Evaluates every combination of tree count and depth limit on a holdout set, plus the full forest.
+        Args:
+            model (RandomForestClassifier): The full trained forest.
+            X (pd.DataFrame): Engineered holdout features.
+            y (array-like): Holdout labels (0/1).
+        Returns:
+            pd.DataFrame: One row per candidate with 'auc', 'model_bytes', 'us_per_prediction' and 'pareto',
+            True for the candidates not beaten on all three by another candidate.
+        """
+
+        X = X.reindex(columns=model.feature_names_in_, fill_value=0)
+        n_estimators = len(model.estimators_)
+        tree_counts = sorted({min(n, n_estimators) for n in self.tree_counts} | {n_estimators})
+
+        rows = []
+        for max_depth in self.max_depths:
+            # Prune all the trees once per depth, the tree subsets are prefixes of it
+            pruned = self.prune(model, n_estimators, max_depth)
+            for n_trees in tree_counts:
+                candidate = self.prune(pruned, n_trees, None)
+                rows.append({"n_trees": n_trees,
+                             "max_depth": max_depth,
+                             **self._measure(candidate, X, y)})
+
+        # The full forest is always measured, it is the reference of `compress`
+        if None not in self.max_depths:
+            rows.append({"n_trees": n_estimators,
+                         "max_depth": None,
+                         **self._measure(model, X, y)})
+
+        results = pd.DataFrame(rows)
+
+        # A candidate is dominated if another one is at least as good on all objectives and better on one
+        objectives = np.column_stack([-results["auc"], results["model_bytes"], results["us_per_prediction"]])
+        at_least = (objectives[:, None, :] <= objectives[None, :, :]).all(axis=2)
+        better = (objectives[:, None, :] < objectives[None, :, :]).any(axis=2)
+        results["pareto"] = ~(at_least & better).any(axis=0)
+
+        return results
+
+    def compress(self,
+                 model: RandomForestClassifier,
+                 X: pd.DataFrame,
+                 y,
+                 output_path: Path = MODELS_DIR / "rf_model_compressed.joblib") -> RandomForestClassifier:
+        """
+        Saves the smallest candidate whose AUC is within `auc_tolerance` of the full forest.
+        The saved model is a RandomForestClassifier with the same features, so it can replace `rf_model.joblib`.
+        Args:
+            model (RandomForestClassifier): The full trained forest.
+            X (pd.DataFrame): Engineered holdout features.
+            y (array-like): Holdout labels (0/1).
+            output_path (Path): Where the compressed model is saved.
+        Returns:
+            RandomForestClassifier: The compressed model.
+        """
+
+        results = self.evaluate(model, X, y)
+
+        full = results[(results["n_trees"] == len(model.estimators_)) & results["max_depth"].isna()].iloc[0]
+        eligible = results[results["auc"] >= full["auc"] - self.auc_tolerance]
+        best = eligible.sort_values(["model_bytes", "us_per_prediction"]).iloc[0]
+
+        max_depth = None if pd.isna(best["max_depth"]) else int(best["max_depth"])
+        compressed = self.prune(model, int(best["n_trees"]), max_depth)
+        joblib.dump(compressed, output_path)
+
+        print(results[results["pareto"]].sort_values("model_bytes").to_string(index=False))
+        print(f"Compressed forest: {int(best['n_trees'])} trees, max depth {max_depth}, "
+              f"AUC {best['auc']:.4f} vs {full['auc']:.4f}, "
+              f"{best['model_bytes'] / 1024**2:.2f} MB vs {full['model_bytes'] / 1024**2:.2f} MB, "
+              f"{best['us_per_prediction']:.1f} µs vs {full['us_per_prediction']:.1f} µs per prediction. "
+              f"Saved at {output_path}")
+
+        self.results = results
+        return compressed
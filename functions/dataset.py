@@ -1,6 +1,117 @@
 ### Imports ###
+import time
+import importlib.util
 import pandas as pd
-from .config import PROCESSED_DATA_DIR
+from pathlib import Path
+from .config import PROCESSED_DATA_DIR, RAW_DATA_DIR
+
+
+# Low-cardinality string columns of the raw telco export, read straight into categoricals
+RAW_CATEGORICAL_COLUMNS = ["gender",
+                           "Partner",
+                           "Dependents",
+                           "PhoneService",
+                           "MultipleLines",
+                           "InternetService",
+                           "OnlineSecurity",
+                           "OnlineBackup",
+                           "DeviceProtection",
+                           "TechSupport",
+                           "StreamingTV",
+                           "StreamingMovies",
+                           "Contract",
+                           "PaperlessBilling",
+                           "PaymentMethod",
+                           "Churn"]
+
+# Declared dtypes for the raw telco schema
+RAW_DTYPES = {
+    "customerID": "object",
+    "SeniorCitizen": "Int8",
+    "tenure": "Int16",
+    "MonthlyCharges": "float64",
+    "TotalCharges": "float64",
+    **{col: "category" for col in RAW_CATEGORICAL_COLUMNS}
+}
+
+# 'TotalCharges' is a blank string for customers with tenure 0
+RAW_NA_VALUES = [" "]
+
+
+
+class LoadDataset:
+    """
+    A class to load the raw telco churn CSV with a declared schema.
+    Args:
+        dtypes (dict): Column to dtype mapping used when parsing the CSV.
+        engine (str): pandas CSV engine, "c" or "pyarrow". Falls back to "c" if pyarrow is not installed.
+    Methods:
+        load(input_path) -> pd.DataFrame:
+            Reads the CSV with the declared dtypes, low-cardinality columns as categoricals
+            and blank 'TotalCharges' entries as NaN.
+        compare(input_path) -> pd.DataFrame:
+            Compares load time and memory of the typed read against a plain `pd.read_csv`.
+    """
+    def __init__(self,
+                 dtypes: dict = RAW_DTYPES,
+                 engine: str = "c"):
+
+        if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+            print("pyarrow is not installed, falling back to the 'c' engine.")
+            engine = "c"
+
+        self.dtypes = dtypes
+        self.engine = engine
+
+    def load(self, 
+             input_path: Path = RAW_DATA_DIR / "churn_raw_data.csv",
+             chunksize: int | None = None) -> pd.DataFrame:
+        """
+        Loads the raw dataset with the declared schema.
+        This method performs the following operations:
+        - Declares the dtype of every column up front, so no type inference is done.
+        - Reads the low-cardinality string columns directly as categoricals.
+        - Parses 'TotalCharges' as float, reading blank entries as NaN.
+        Args:
+            input_path (Path): The file path to the raw CSV dataset.
+            chunksize (int | None): If set, returns an iterator of DataFrames of `chunksize` rows
+                (read with the 'c' engine, pyarrow does not support chunks).
+        Returns:
+            pd.DataFrame: The raw dataset with typed columns.
+        """
+
+        return pd.read_csv(input_path,
+                           dtype=self.dtypes,
+                           na_values=RAW_NA_VALUES,
+                           chunksize=chunksize,
+                           engine="c" if chunksize else self.engine) #type: ignore
+
+    def compare(self, input_path: Path = RAW_DATA_DIR / "churn_raw_data.csv") -> pd.DataFrame:
+        """
+        Compares the typed load against the untyped `pd.read_csv(input_path)`.
+        Args:
+            input_path (Path): The file path to the raw CSV dataset.
+        Returns:
+            pd.DataFrame: Load time (s) and memory (MB) of each read, one row per method.
+        """
+
+        results = []
+        for method, reader in [("pd.read_csv", lambda: pd.read_csv(input_path)),
+                               (f"LoadDataset ({self.engine})", lambda: self.load(input_path))]:
+            start = time.perf_counter()
+            data = reader()
+            elapsed = time.perf_counter() - start
+
+            results.append({"method": method,
+                            "rows": data.shape[0],
+                            "load_time_s": elapsed,
+                            "memory_mb": data.memory_usage(deep=True).sum() / 1024**2})
+            del data
+
+        comparison = pd.DataFrame(results).set_index("method")
+        print(comparison)
+
+        return comparison
 
 
 
@@ -20,7 +131,24 @@ class CleanDataset:
     def __init__(self,):
         pass
 
-    def clean(self, data: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _replace(column: pd.Series, mapping: dict) -> pd.Series:
+        """
+        Replaces values of a column. Categorical columns (from `LoadDataset.load`) get their categories
+        renamed, since `replace` on categories is deprecated in pandas.
+        """
+
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            renamed = [mapping.get(category, category) for category in column.cat.categories]
+            if len(set(renamed)) == len(renamed):
+                return column.cat.rename_categories(renamed)
+
+            # Values mapped onto an existing category are merged, as `replace` does
+            return column.astype(object).replace(mapping).astype("category")
+
+        return column.replace(mapping)
+
+    def clean(self, data: pd.DataFrame, save: bool = True) -> pd.DataFrame:
         """
         Cleans the dataset loaded from the specified input path.
         This method performs the following operations:
@@ -33,6 +161,10 @@ class CleanDataset:
         - Maps the 'seniorcitizen' column from 0/1 to 'no'/'yes'.
         - Simplifies the 'paymentmethod' column by replacing specific values.
         - Simplifies the 'contract' column by replacing "month-to-month" with "monthly".
+        - Saves the cleaned dataset to the processed data directory, unless `save` is False.
+        Args:
+            data (pd.DataFrame): The raw dataset.
+            save (bool): Whether to save the cleaned dataset (disable it when cleaning chunks of a stream).
         Returns:
             pd.DataFrame: The cleaned dataset.
         Raises:
@@ -50,23 +182,24 @@ class CleanDataset:
             raw_data = raw_data.drop(['customerid'], axis=1)
             
             raw_data['totalcharges'] = pd.to_numeric(raw_data['totalcharges'], errors='coerce')
-            mask = (raw_data['totalcharges'].isna()) & (raw_data['tenure'] == 0)
+            mask = (raw_data['totalcharges'].isna()) & (raw_data['tenure'] == 0).fillna(False)
             raw_data.loc[mask, 'totalcharges'] = 0
             
             raw_data['seniorcitizen'] = raw_data['seniorcitizen'].map({0: 'no', 1: 'yes'})
             
-            raw_data['paymentmethod'] = raw_data['paymentmethod'].replace({
+            raw_data['paymentmethod'] = self._replace(raw_data['paymentmethod'], {
                 "bank transfer (automatic)": "bank transfer",
                 "credit card (automatic)": "credit card"
                 })
             
-            raw_data['contract'] = raw_data['contract'].replace({
+            raw_data['contract'] = self._replace(raw_data['contract'], {
                 "month-to-month": "monthly"
             })
             
             # Save the cleaned dataset to the processed data directory
-            processed_path = PROCESSED_DATA_DIR / f"churn_clean_data.csv"
-            raw_data.to_csv(processed_path, index=False)
+            if save:
+                processed_path = PROCESSED_DATA_DIR / f"churn_clean_data.csv"
+                raw_data.to_csv(processed_path, index=False)
             
             return raw_data
         
@@ -0,0 +1,223 @@
+### Imports ###
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from joblib import Parallel, delayed
+
+from .config import RAW_DATA_DIR, MODELS_DIR, REPORTS_DIR
+from .dataset import LoadDataset, CleanDataset
+from .features import FeatureEng
+
+
+
+def _sweep(y_true: np.ndarray, y_proba: np.ndarray, cost_per_contact: float, value_per_save: float) -> pd.DataFrame:
+    """
+    Computes the campaign profit of every candidate threshold in a single sorted-cumsum pass.
+    Customers are sorted by decreasing score; contacting everyone with a score >= threshold gives
+    tp = cumsum(y) and contacts = rank at the last customer of each distinct score.
+    The first row, threshold = inf, contacts nobody, so an unprofitable campaign picks it with a profit of 0.
+    """
+
+    order = np.argsort(-y_proba, kind="stable")
+    scores = y_proba[order]
+    true_positives = np.cumsum(y_true[order])
+    contacts = np.arange(1, len(scores) + 1)
+
+    # Keep the last position of each run of tied scores, so ties are contacted together
+    last = np.r_[scores[1:] != scores[:-1], True]
+
+    sweep = pd.DataFrame({"threshold": np.r_[np.inf, scores[last]],
+                          "contacts": np.r_[0, contacts[last]],
+                          "true_positives": np.r_[0, true_positives[last]]})
+    sweep["false_positives"] = sweep["contacts"] - sweep["true_positives"]
+    sweep["profit"] = value_per_save * sweep["true_positives"] - cost_per_contact * sweep["contacts"]
+
+    return sweep
+
+
+def _bootstrap(y_true: np.ndarray,
+               y_proba: np.ndarray,
+               threshold: float,
+               cost_per_contact: float,
+               value_per_save: float,
+               seeds: list) -> np.ndarray:
+    """
+    Resamples the holdout once per seed and returns, for each sample, the optimal threshold,
+    its profit and the profit of the given threshold.
+    """
+
+    results = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        idx = rng.integers(0, len(y_true), len(y_true))
+        y, p = y_true[idx], y_proba[idx]
+
+        sweep = _sweep(y, p, cost_per_contact, value_per_save)
+        best = sweep["profit"].idxmax()
+
+        contacted = p >= threshold
+        profit = value_per_save * y[contacted].sum() - cost_per_contact * contacted.sum()
+
+        results.append((sweep.at[best, "threshold"], sweep.at[best, "profit"], profit))
+
+    return np.array(results, dtype=float)
+
+
+class DecisionThreshold:
+    """
+    A class to choose the churn probability cutoff that maximizes the profit of a retention campaign.
+    Contacting a customer costs `cost_per_contact`, and contacting a customer that would churn is worth
+    `value_per_save`, so the profit of a threshold is: value_per_save * TP - cost_per_contact * (TP + FP).
+    Args:
+        cost_per_contact (float): Cost of contacting one customer.
+        value_per_save (float): Value of contacting one customer that would churn.
+        n_bootstrap (int): Number of bootstrap samples used for the confidence intervals.
+        confidence (float): Confidence level of the intervals.
+        n_jobs (int): Number of parallel jobs for the bootstrap.
+        random_state (int): Seed of the bootstrap samples.
+    Methods:
+        sweep(y_true, y_proba) -> pd.DataFrame:
+            Returns TP, FP, contacts and profit of every threshold.
+        fit(y_true, y_proba) -> DecisionThreshold:
+            Picks the profit-maximizing threshold and its bootstrap confidence intervals.
+        predict(y_proba) -> np.ndarray:
+            Applies the threshold to a batch of scores.
+        save(path) / load(path):
+            Persists the fitted threshold next to the model.
+    """
+    def __init__(self,
+                 cost_per_contact: float = 10.0,
+                 value_per_save: float = 100.0,
+                 n_bootstrap: int = 1000,
+                 confidence: float = 0.95,
+                 n_jobs: int = -1,
+                 random_state: int = 42):
+
+        self.cost_per_contact = cost_per_contact
+        self.value_per_save = value_per_save
+        self.n_bootstrap = n_bootstrap
+        self.confidence = confidence
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.threshold = 0.5
+        self.profit = None
+        self.intervals = {}
+
+    def sweep(self, y_true, y_proba) -> pd.DataFrame:
+        """
+        Computes the profit of every distinct score used as threshold, without a per-threshold loop.
+        Args:
+            y_true (array-like): True labels (0/1).
+            y_proba (array-like): Churn probabilities from `predict_proba(X)[:, 1]`.
+        Returns:
+            pd.DataFrame: Columns 'threshold', 'contacts', 'true_positives', 'false_positives' and 'profit',
+            starting with threshold = inf (contact nobody).
+        """
+
+        return _sweep(np.asarray(y_true), np.asarray(y_proba, dtype=float), self.cost_per_contact, self.value_per_save)
+
+    def fit(self, y_true, y_proba):
+        """
+        Picks the profit-maximizing threshold on a holdout set.
+        Steps performed:
+            - Sweeps every threshold and keeps the one with the highest profit.
+            - Bootstraps the holdout in parallel to get confidence intervals of the optimal threshold,
+              the optimal profit and the profit of the chosen threshold.
+        Args:
+            y_true (array-like): True labels (0/1).
+            y_proba (array-like): Churn probabilities from `predict_proba(X)[:, 1]`.
+        Returns:
+            DecisionThreshold: The fitted instance.
+        """
+
+        y_true = np.asarray(y_true)
+        y_proba = np.asarray(y_proba, dtype=float)
+
+        sweep = self.sweep(y_true, y_proba)
+        best = sweep["profit"].idxmax()
+        self.threshold = float(sweep.at[best, "threshold"])
+        self.profit = float(sweep.at[best, "profit"])
+
+        # Independent seeds for each bootstrap sample, split in one chunk per job
+        seeds = np.random.SeedSequence(self.random_state).spawn(self.n_bootstrap)
+        n_chunks = min(self.n_bootstrap, joblib.effective_n_jobs(self.n_jobs))
+        chunks = [list(chunk) for chunk in np.array_split(np.array(seeds, dtype=object), n_chunks)]
+
+        results = np.vstack(Parallel(n_jobs=self.n_jobs)(
+            delayed(_bootstrap)(y_true, y_proba, self.threshold, self.cost_per_contact, self.value_per_save, chunk)
+            for chunk in chunks
+        ))
+
+        # Percentiles taken at observed samples, since the threshold can be inf (contact nobody)
+        alpha = (1 - self.confidence) / 2
+        for i, name in enumerate(["optimal_threshold", "optimal_profit", "threshold_profit"]):
+            low, high = np.quantile(results[:, i], [alpha, 1 - alpha], method="nearest")
+            self.intervals[name] = (float(low), float(high))
+
+        print(f"Decision threshold: {self.threshold:.3f} (profit {self.profit:.2f}, "
+              f"{self.confidence:.0%} CI of the threshold: "
+              f"{self.intervals['optimal_threshold'][0]:.3f} - {self.intervals['optimal_threshold'][1]:.3f})")
+
+        return self
+
+    def predict(self, y_proba) -> np.ndarray:
+        """
+        Flags the customers to contact.
+        Args:
+            y_proba (array-like): Churn probabilities from `predict_proba(X)[:, 1]`.
+        Returns:
+            np.ndarray: 1 for customers with a probability >= threshold, 0 otherwise (all 0 when the
+            threshold is inf, i.e. when no campaign is profitable).
+        """
+
+        return (np.asarray(y_proba) >= self.threshold).astype(int)
+
+    def save(self, path: Path = MODELS_DIR / "rf_threshold.joblib"):
+        """
+        Saves the fitted threshold and the campaign parameters with joblib.
+        """
+
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: Path = MODELS_DIR / "rf_threshold.joblib") -> "DecisionThreshold":
+        """
+        Loads a threshold saved with `save`.
+        """
+
+        return joblib.load(path)
+
+
+def main(
+    input_path: Path = RAW_DATA_DIR / "churn_raw_data.csv",
+    model_path: Path = MODELS_DIR / "rf_model.joblib",
+    threshold_path: Path = MODELS_DIR / "rf_threshold.joblib",
+    categories_path: Path = MODELS_DIR / "feature_categories.joblib",
+    output_path: Path = REPORTS_DIR / "churn_scores.csv"
+):
+    data = LoadDataset().load(input_path)
+    customer_ids = data["customerID"]
+
+    X = data.drop(columns=["Churn"])
+    X = CleanDataset().clean(X, save=False)
+    # Encode the batch with the levels of the training data, whatever levels it holds
+    X = FeatureEng(categories=joblib.load(categories_path)).feature_eng(X)
+
+    model = joblib.load(model_path)
+    decision = DecisionThreshold.load(threshold_path)
+
+    X = X[model.feature_names_in_]
+    y_proba = model.predict_proba(X)[:, 1]
+
+    scores = pd.DataFrame({"customerid": customer_ids,
+                           "churn_proba": y_proba,
+                           "contact": decision.predict(y_proba)})
+
+    scores.to_csv(output_path, index=False)
+    print(f"{scores['contact'].sum()} of {scores.shape[0]} customers flagged for contact "
+          f"(threshold {decision.threshold:.3f}), saved at {output_path}")
+
+
+if __name__ == "__main__":
+    main()
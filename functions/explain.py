@@ -0,0 +1,169 @@
+### Imports ###
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+
+from .config import RAW_DATA_DIR, MODELS_DIR, REPORTS_DIR
+from .dataset import LoadDataset, CleanDataset
+from .features import FeatureEng
+
+
+
+class ExplainPredictions:
+    """
+    A class to explain the churn probability of each customer as a sum of per-feature contributions.
+    For every tree, the change in the churn probability between a node and its child is credited to the
+    feature the node splits on, so that: predict_proba = bias + sum(contributions).
+    Args:
+        model (RandomForestClassifier): Trained random forest.
+        one_hot_columns (list): Original columns that were one-hot encoded, their dummy columns are
+            summed back into a single contribution.
+        batch_size (int): Number of customers explained at once, bounds the memory of the decision paths.
+    Methods:
+        contributions(X) -> tuple[np.ndarray, pd.DataFrame]:
+            Returns the bias and the per-feature contributions to the churn probability.
+        top_drivers(X, k) -> pd.DataFrame:
+            Returns the k features pushing each customer the most towards churn.
+    """
+    def __init__(self,
+                 model: RandomForestClassifier,
+                 one_hot_columns: list = FeatureEng().one_hot_columns,
+                 batch_size: int = 50_000):
+
+        self.model = model
+        self.one_hot_columns = one_hot_columns
+        self.batch_size = batch_size
+        self.feature_names = list(model.feature_names_in_)
+        self.node_contributions = self._node_contributions()
+
+    def _node_contributions(self) -> sparse.csr_matrix:
+        """
+        Builds a sparse (total nodes of the forest x features) matrix in which the row of each node holds the
+        change in churn probability from its parent, in the column of the feature the parent splits on.
+        Rows follow the node order of `model.decision_path`, so a decision path times this matrix gives the
+        contributions of every tree at once.
+        """
+
+        rows, cols, values = [], [], []
+        offset = 0
+        n_trees = len(self.model.estimators_)
+
+        for estimator in self.model.estimators_:
+            tree = estimator.tree_
+
+            # Churn probability at each node (normalized, so counts or fractions both work)
+            value = tree.value[:, 0, :]
+            proba = value[:, 1] / value.sum(axis=1)
+
+            internal = np.flatnonzero(tree.children_left >= 0)
+            for children in (tree.children_left, tree.children_right):
+                child = children[internal]
+                rows.append(offset + child)
+                cols.append(tree.feature[internal])
+                values.append((proba[child] - proba[internal]) / n_trees)
+
+            offset += tree.node_count
+
+        return sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(offset, len(self.feature_names)))
+
+    def _bias(self) -> float:
+        """
+        Mean churn probability at the root of the trees, the prediction before any split.
+        """
+
+        root = [estimator.tree_.value[0, 0, :] for estimator in self.model.estimators_]
+        return float(np.mean([value[1] / value.sum() for value in root]))
+
+    def contributions(self, X: pd.DataFrame) -> tuple[float, pd.DataFrame]:
+        """
+        Computes the per-feature contributions to the churn probability of each customer.
+        Steps performed:
+            - Reorders the columns of X to the features the model was trained on (a missing feature raises a KeyError).
+            - Gets the decision paths of a batch through all the trees in one call.
+            - Multiplies the paths by the node contribution matrix.
+            - Sums the dummy columns of each one-hot encoded column back into the original column.
+        Args:
+            X (pd.DataFrame): Engineered features, as returned by `FeatureEng(categories=...).feature_eng`.
+        Returns:
+            tuple[float, pd.DataFrame]: The bias and a DataFrame of contributions indexed like X.
+        """
+
+        X = X[self.feature_names]
+
+        batches = []
+        for start in range(0, len(X), self.batch_size):
+            paths, _ = self.model.decision_path(X.iloc[start:start + self.batch_size])
+            batches.append((paths @ self.node_contributions).toarray())
+
+        contributions = pd.DataFrame(np.vstack(batches) if batches else np.empty((0, len(self.feature_names))),
+                                     index=X.index,
+                                     columns=self.feature_names)
+
+        # Map the one-hot dummies back to their original column
+        groups = {}
+        for feature in self.feature_names:
+            groups[feature] = next((col for col in self.one_hot_columns if feature.startswith(f"{col}_")), feature)
+
+        contributions = contributions.T.groupby(groups, sort=False).sum().T
+
+        return self._bias(), contributions
+
+    def top_drivers(self, X: pd.DataFrame, k: int = 3) -> pd.DataFrame:
+        """
+        Returns the k features pushing each customer the most towards churn.
+        Args:
+            X (pd.DataFrame): Engineered features, as returned by `FeatureEng.feature_eng`.
+            k (int): Number of drivers per customer.
+        Returns:
+            pd.DataFrame: One row per customer with the churn probability and, for each rank i,
+            the columns 'driver_i' and 'contribution_i'.
+        """
+
+        bias, contributions = self.contributions(X)
+
+        values = contributions.to_numpy()
+        k = min(k, values.shape[1])
+
+        # Top-k without a full sort, then order the k selected columns
+        top = np.argpartition(-values, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(values, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        names = contributions.columns.to_numpy()
+        drivers = pd.DataFrame({"churn_proba": bias + values.sum(axis=1)}, index=contributions.index)
+        for i in range(k):
+            drivers[f"driver_{i + 1}"] = names[top[:, i]]
+            drivers[f"contribution_{i + 1}"] = np.take_along_axis(values, top[:, [i]], axis=1)[:, 0]
+
+        return drivers
+
+
+def main(
+    input_path: Path = RAW_DATA_DIR / "churn_raw_data.csv",
+    model_path: Path = MODELS_DIR / "rf_model.joblib",
+    categories_path: Path = MODELS_DIR / "feature_categories.joblib",
+    output_path: Path = REPORTS_DIR / "churn_drivers.csv",
+    k: int = 3
+):
+    data = LoadDataset().load(input_path)
+    customer_ids = data["customerID"]
+
+    X = data.drop(columns=["Churn"])
+    X = CleanDataset().clean(X, save=False)
+    # Encode the batch with the levels of the training data, whatever levels it holds
+    X = FeatureEng(categories=joblib.load(categories_path)).feature_eng(X)
+
+    explainer = ExplainPredictions(joblib.load(model_path))
+    drivers = explainer.top_drivers(X, k)
+    drivers.insert(0, "customerid", customer_ids)
+
+    drivers.to_csv(output_path, index=False)
+    print(f"Churn drivers of {drivers.shape[0]} customers saved at {output_path}")
+
+
+if __name__ == "__main__":
+    main()
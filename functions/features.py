@@ -22,12 +22,29 @@ class FeatureEng():
                                           "streamingmovies", 
                                           "paymentmethod"],
                  label_encoder: LabelEncoder = LabelEncoder(),
-                 one_hot_encoder: OneHotEncoder = OneHotEncoder(sparse_output=False)):
+                 one_hot_encoder: OneHotEncoder = OneHotEncoder(sparse_output=False),
+                 categories: dict | None = None):
         
         self.label_columns = label_columns
         self.one_hot_columns = one_hot_columns
         self.label_encoder = label_encoder
         self.one_hot_encoder = one_hot_encoder
+        self.categories = categories
+
+    def fit_categories(self, 
+                       data: pd.DataFrame) -> dict:
+        """
+        Returns the sorted levels of the label and one-hot columns of the (cleaned) training data.
+        Passed as `categories`, they make every batch encoded like the training data, whatever levels
+        the batch holds (e.g. a small chunk of a stream).
+        Args:
+            data (pd.DataFrame): Cleaned training data.
+        Returns:
+            dict: Sorted levels of each column.
+        """
+
+        return {col: sorted(data[col].dropna().unique().tolist()) 
+                for col in self.label_columns + self.one_hot_columns if col in data.columns}
 
     def feature_eng(self, 
                     data: pd.DataFrame) -> pd.DataFrame:
@@ -38,6 +55,8 @@ class FeatureEng():
             - Maps the 'contract' column values ('monthly', 'one year', 'two year') to integers (0, 1, 2).
             - Applies label encoding to columns specified in self.label_columns, if present in the DataFrame.
             - Applies one-hot encoding to columns specified in self.one_hot_columns.
+            - If `categories` is set, both encodings use its levels instead of the levels found in the data,
+              and levels not in `categories` are encoded as -1 (label) or all zeros (one-hot).
             - Concatenates the one-hot encoded columns with the rest of the DataFrame, dropping the original one-hot columns.
         Args:
             data (pd.DataFrame): Input DataFrame containing features to be engineered.
@@ -47,21 +66,30 @@ class FeatureEng():
 
         print(f"Extracting features")
         
-        # Map 'contract' column values to integers
-        data['contract'] = data['contract'].map({'monthly': 0, 
-                                                 'one year': 12, 
-                                                 'two year': 24})
+        # Map 'contract' column values to integers (categorical input is mapped as object, so the result stays numeric)
+        data['contract'] = data['contract'].astype(object).map({'monthly': 0, 
+                                                                 'one year': 12, 
+                                                                 'two year': 24})
         
-        # Label Encoding
+        # Label Encoding (the codes of the sorted levels, as LabelEncoder gives them)
         for col in self.label_columns:
             if col in data.columns:
-                data[col] = self.label_encoder.fit_transform(data[col])
+                if self.categories is None:
+                    data[col] = self.label_encoder.fit_transform(data[col])
+                else:
+                    data[col] = pd.Categorical(data[col], categories=self.categories[col]).codes.astype(int)
         
         # One-Hot Encoding
-        one_hot_data = self.one_hot_encoder.fit_transform(data[self.one_hot_columns])
+        one_hot_encoder = self.one_hot_encoder
+        if self.categories is not None:
+            one_hot_encoder = OneHotEncoder(categories=[self.categories[col] for col in self.one_hot_columns],
+                                            sparse_output=False,
+                                            handle_unknown="ignore")
+
+        one_hot_data = one_hot_encoder.fit_transform(data[self.one_hot_columns])
         one_hot_df = pd.DataFrame(
                     one_hot_data, 
-                    columns=self.one_hot_encoder.get_feature_names_out(self.one_hot_columns),
+                    columns=one_hot_encoder.get_feature_names_out(self.one_hot_columns),
                     index=data.index
                 )
 
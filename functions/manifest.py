@@ -0,0 +1,190 @@
+### Imports ###
+import json
+import zlib
+import hashlib
+import inspect
+import platform
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from importlib.metadata import version, PackageNotFoundError
+
+
+# Libraries whose versions can change the outputs of the pipeline
+TRACKED_LIBRARIES = ["numpy", "pandas", "scikit-learn", "imbalanced-learn", "scipy", "joblib"]
+
+
+
+def file_hash(path: Path, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file, read in blocks so large inputs are not loaded in memory.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def library_versions() -> dict:
+    """
+    Versions of Python and of the tracked libraries.
+    """
+
+    versions = {"python": platform.python_version()}
+    for lib in TRACKED_LIBRARIES:
+        try:
+            versions[lib] = version(lib)
+        except PackageNotFoundError:
+            versions[lib] = None
+
+    return versions
+
+
+class RunManifest:
+    """
+    A class to record what a pipeline run used and produced, and to skip the stages that are up to date.
+    The manifest records the input hashes, the config, the seed of each stage, the library versions, the
+    hashes of the source files run and, for each stage, a key of everything it depends on plus the hashes
+    of its output artifacts.
+    A stage is up to date, like in a build system, when its key matches the previous run and all its
+    outputs still exist with the recorded hashes.
+    Args:
+        path (Path): JSON file of the manifest, read at init if it exists.
+        random_state (int): Root seed, every stage seed is derived from it.
+        config (dict): Parameters of the run.
+    Methods:
+        seed(stage) -> int:
+            Reproducible seed of a stage, independent from the seeds of the other stages.
+        seed_sequence(stage) -> np.random.SeedSequence:
+            Seed sequence of a stage, whose `spawn(n)` gives independent streams for parallel workers.
+        add_input(name, path) -> str:
+            Hashes an input file.
+        add_code(obj) -> str:
+            Hashes the source file of a class or module.
+        stage_key(stage, config, seeds, code, upstream) -> str:
+            Key of everything a stage depends on.
+        up_to_date(stage, key) -> bool:
+            Whether the stage can be skipped.
+        record(stage, key, outputs):
+            Records the outputs of a stage.
+        save():
+            Writes the manifest.
+    """
+    def __init__(self,
+                 path: Path,
+                 random_state: int,
+                 config: dict):
+
+        self.path = path
+        self.random_state = random_state
+        self.previous = json.loads(path.read_text()) if path.exists() else {}
+        self.manifest = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": config,
+            "random_state": random_state,
+            "seeds": {},
+            "versions": library_versions(),
+            "inputs": {},
+            "code": {},
+            "stages": {}
+        }
+
+    def seed_sequence(self, stage: str) -> np.random.SeedSequence:
+        """
+        Seed sequence of a stage: the root seed with a spawn key derived from the stage name.
+        """
+
+        return np.random.SeedSequence(self.random_state, spawn_key=(zlib.crc32(stage.encode()),))
+
+    def seed(self, stage: str) -> int:
+        """
+        Reproducible integer seed of a stage, for the `random_state` of scikit-learn and imblearn.
+        """
+
+        seed = int(self.seed_sequence(stage).generate_state(1)[0])
+        self.manifest["seeds"][stage] = seed
+
+        return seed
+
+    def add_input(self, name: str, path: Path) -> str:
+        """
+        Hashes an input file and records it.
+        """
+
+        digest = file_hash(path)
+        self.manifest["inputs"][name] = {"path": str(path), "sha256": digest}
+
+        return digest
+
+    def add_code(self, obj) -> str:
+        """
+        Hashes the source file of a class or module and records it, so editing the code run by a
+        stage makes the stage out of date.
+        """
+
+        path = Path(inspect.getsourcefile(obj))  # type: ignore
+        digest = file_hash(path)
+        self.manifest["code"][path.name] = {"path": str(path), "sha256": digest}
+
+        return digest
+
+    def stage_key(self,
+                  stage: str,
+                  config: list = [],
+                  seeds: list = [],
+                  code: list = [],
+                  upstream: list = []) -> str:
+        """
+        Key of everything a stage depends on: all the inputs, the library versions, the given config
+        parameters and stage seeds, the source files of the given classes or modules, and the keys of
+        the upstream stages.
+        """
+
+        dependencies = {
+            "stage": stage,
+            "inputs": {name: item["sha256"] for name, item in self.manifest["inputs"].items()},
+            "versions": self.manifest["versions"],
+            "config": {name: self.manifest["config"][name] for name in config},
+            "seeds": {name: self.seed(name) for name in seeds},
+            "code": sorted(self.add_code(obj) for obj in code),
+            "upstream": upstream
+        }
+
+        return hashlib.sha256(json.dumps(dependencies, sort_keys=True, default=str).encode()).hexdigest()
+
+    def up_to_date(self, stage: str, key: str) -> bool:
+        """
+        Whether a stage has the same key as in the previous run and all its outputs are unchanged.
+        An up-to-date stage is carried over to the new manifest.
+        """
+
+        previous = self.previous.get("stages", {}).get(stage)
+        if previous is None or previous["key"] != key:
+            return False
+
+        for path, digest in previous["outputs"].items():
+            if not Path(path).exists() or file_hash(Path(path)) != digest:
+                return False
+
+        self.manifest["stages"][stage] = previous
+        return True
+
+    def record(self, stage: str, key: str, outputs: list):
+        """
+        Records the key of a stage and the hashes of its output artifacts.
+        """
+
+        self.manifest["stages"][stage] = {
+            "key": key,
+            "outputs": {str(path): file_hash(path) for path in outputs}
+        }
+
+    def save(self):
+        """
+        Writes the manifest as JSON.
+        """
+
+        self.path.write_text(json.dumps(self.manifest, indent=4, default=str))
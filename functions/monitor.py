@@ -0,0 +1,237 @@
+### Imports ###
+import joblib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from .config import RAW_DATA_DIR, MODELS_DIR, REPORTS_DIR
+from .dataset import LoadDataset, RAW_DTYPES
+
+
+# Scoring batches are read with the numeric columns as text, so empty or invalid values in a batch
+# are counted by the monitor instead of failing the typed read
+BATCH_DTYPES = {**RAW_DTYPES, **{col: "object" for col in ["SeniorCitizen", "tenure", "MonthlyCharges", "TotalCharges"]}}
+
+
+
+class DriftMonitor:
+    """
+    A class to check whether incoming scoring batches still look like the training data.
+    From the raw training data it keeps a compact reference per column: category counts for the
+    string and low-cardinality columns, counts over quantile bins for the numeric columns, and the null count.
+    Scoring batches are accumulated in the same histograms in a single pass, chunk by chunk. Values of a
+    numeric column that are not numbers in a batch are counted as nulls (they become NaN when cleaned).
+    Args:
+        n_bins (int): Number of quantile bins of the numeric columns.
+        psi_threshold (float): PSI above which a column is flagged as drifted (0.2 is a major shift).
+        null_tolerance (float): Increase of the null rate above the reference that is flagged as a null spike.
+        exclude (list): Columns not monitored.
+    Methods:
+        fit(data) -> DriftMonitor:
+            Builds the reference histograms from the raw training data.
+        update(batch):
+            Accumulates a chunk of a scoring batch.
+        report() -> pd.DataFrame:
+            PSI, KS, unseen categories and null rates of the accumulated batch, one row per column.
+        reset():
+            Clears the accumulated batch.
+    """
+    def __init__(self,
+                 n_bins: int = 10,
+                 psi_threshold: float = 0.2,
+                 null_tolerance: float = 0.01,
+                 exclude: list = ["customerID", "Churn"]):
+
+        self.n_bins = n_bins
+        self.psi_threshold = psi_threshold
+        self.null_tolerance = null_tolerance
+        self.exclude = exclude
+        self.reference = {}
+        self.batch = {}
+
+    def _histogram(self, column: pd.Series, ref: dict):
+        """
+        Counts of a column over the reference categories or bins, its number of nulls and, for the
+        numeric columns, its number of invalid values (not numbers, included in the nulls).
+        """
+
+        invalid = 0
+        if ref["numeric"]:
+            values = pd.to_numeric(column, errors="coerce").astype(float)
+            invalid = int((values.isna() & column.notna()).sum())
+            column = values
+
+        nulls = int(column.isna().sum())
+
+        if ref["kind"] == "categorical":
+            counts = column.value_counts(dropna=True)
+            counts = counts[counts > 0]
+            return pd.Series(counts.to_numpy(), index=counts.index.astype(object)), nulls, invalid
+
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+        counts, _ = np.histogram(values[~np.isnan(values)], bins=ref["edges"])
+        return counts, nulls, invalid
+
+    def fit(self, data: pd.DataFrame):
+        """
+        Builds the reference histograms from the raw training data.
+        Args:
+            data (pd.DataFrame): Raw training data, as returned by `LoadDataset.load`.
+        Returns:
+            DriftMonitor: The fitted instance.
+        """
+
+        self.reference = {}
+        for col in data.columns.drop(self.exclude, errors="ignore"):
+            column = data[col]
+
+            # Numeric columns with few distinct values (e.g. 'SeniorCitizen') are monitored as categories
+            numeric = pd.api.types.is_numeric_dtype(column)
+            if numeric and column.nunique() > self.n_bins:
+                edges = np.unique(np.nanquantile(column.to_numpy(dtype=float, na_value=np.nan),
+                                                 np.linspace(0, 1, self.n_bins + 1)[1:-1]))
+                ref = {"kind": "numeric", "numeric": True, "edges": np.r_[-np.inf, edges, np.inf]}
+            else:
+                ref = {"kind": "categorical", "numeric": numeric}
+
+            ref["counts"], ref["nulls"], _ = self._histogram(column, ref)
+            ref["rows"] = len(column)
+            self.reference[col] = ref
+
+        self.reset()
+        return self
+
+    def reset(self):
+        """
+        Clears the accumulated scoring batch.
+        """
+
+        self.batch = {col: {"counts": None, "nulls": 0, "invalid": 0, "rows": 0} for col in self.reference}
+
+    def update(self, batch: pd.DataFrame):
+        """
+        Accumulates a chunk of a scoring batch in the histograms of each column.
+        Args:
+            batch (pd.DataFrame): Raw data, with the same columns as the training data. The numeric columns
+                can be typed or text (read with `BATCH_DTYPES`).
+        """
+
+        for col, ref in self.reference.items():
+            acc = self.batch[col]
+
+            if col not in batch.columns:
+                acc["nulls"] += len(batch)
+                acc["rows"] += len(batch)
+                continue
+
+            counts, nulls, invalid = self._histogram(batch[col], ref)
+            if acc["counts"] is None:
+                acc["counts"] = counts
+            elif ref["kind"] == "categorical":
+                acc["counts"] = acc["counts"].add(counts, fill_value=0)
+            else:
+                acc["counts"] = acc["counts"] + counts
+
+            acc["nulls"] += nulls
+            acc["invalid"] += invalid
+            acc["rows"] += len(batch)
+
+    @staticmethod
+    def _psi(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-4) -> float:
+        """
+        Population Stability Index between two count vectors over the same bins.
+        """
+
+        e = np.clip(expected / max(expected.sum(), 1), eps, None)
+        a = np.clip(actual / max(actual.sum(), 1), eps, None)
+        return float(np.sum((a - e) * np.log(a / e)))
+
+    def report(self) -> pd.DataFrame:
+        """
+        Compares the accumulated batch with the reference.
+        For each column it computes:
+            - psi: Population Stability Index over the categories or bins.
+            - ks: Kolmogorov-Smirnov statistic over the bins (numeric columns only). It is computed on
+              the binned CDFs, so it is a lower bound of the exact KS statistic.
+            - unseen_categories: categories not present in the training data (these become NaN in
+              `CleanDataset.clean` for 'contract' and 'seniorcitizen').
+            - null rates of the reference and of the batch, and a null spike flag. Invalid values of the
+              numeric columns count as nulls, and are also reported as 'invalid_values'.
+        Returns:
+            pd.DataFrame: One row per column, with a 'drift' flag for any of the checks.
+        """
+
+        rows = []
+        for col, ref in self.reference.items():
+            acc = self.batch[col]
+            unseen = []
+
+            if acc["counts"] is None:
+                psi, ks = np.nan, np.nan
+            elif ref["kind"] == "categorical":
+                categories = ref["counts"].index.union(acc["counts"].index)
+                expected = ref["counts"].reindex(categories, fill_value=0).to_numpy(dtype=float)
+                actual = acc["counts"].reindex(categories, fill_value=0).to_numpy(dtype=float)
+                psi, ks = self._psi(expected, actual), np.nan
+                unseen = [str(cat) for cat in acc["counts"].index.difference(ref["counts"].index)]
+            else:
+                expected = ref["counts"].astype(float)
+                actual = acc["counts"].astype(float)
+                psi = self._psi(expected, actual)
+                ks = float(np.abs(np.cumsum(expected) / max(expected.sum(), 1)
+                                  - np.cumsum(actual) / max(actual.sum(), 1)).max())
+
+            ref_null_rate = ref["nulls"] / max(ref["rows"], 1)
+            null_rate = acc["nulls"] / max(acc["rows"], 1)
+            null_spike = null_rate > ref_null_rate + self.null_tolerance
+
+            rows.append({"column": col,
+                         "psi": psi,
+                         "ks": ks,
+                         "unseen_categories": ", ".join(unseen),
+                         "ref_null_rate": ref_null_rate,
+                         "null_rate": null_rate,
+                         "invalid_values": acc["invalid"],
+                         "null_spike": null_spike,
+                         "drift": bool(psi > self.psi_threshold) or bool(unseen) or null_spike})
+
+        return pd.DataFrame(rows).set_index("column")
+
+    def save(self, path: Path = MODELS_DIR / "drift_reference.joblib"):
+        """
+        Saves the reference histograms with joblib.
+        """
+
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: Path = MODELS_DIR / "drift_reference.joblib") -> "DriftMonitor":
+        """
+        Loads a reference saved with `save`.
+        """
+
+        return joblib.load(path)
+
+
+def main(
+    input_path: Path = RAW_DATA_DIR / "churn_raw_data.csv",
+    reference_path: Path = MODELS_DIR / "drift_reference.joblib",
+    output_path: Path = REPORTS_DIR / "drift_report.csv",
+    chunksize: int | None = 100_000
+):
+    monitor = DriftMonitor.load(reference_path)
+    monitor.reset()
+
+    chunks = LoadDataset(dtypes=BATCH_DTYPES).load(input_path, chunksize=chunksize)
+    for chunk in ([chunks] if chunksize is None else chunks):
+        monitor.update(chunk)
+
+    report = monitor.report()
+    report.to_csv(output_path)
+
+    print(report)
+    print(f"{report['drift'].sum()} of {report.shape[0]} columns flagged, report saved at {output_path}")
+
+
+if __name__ == "__main__":
+    main()
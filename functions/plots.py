@@ -1,13 +1,16 @@
 
 ### Imports ###
+import json
+import time
+import hashlib
+import itertools
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from pathlib import Path
-from scipy.optimize import curve_fit
 import matplotlib
 import matplotlib.pyplot as plt
-from config import PROCESSED_DATA_DIR, FIGURES_DIR
+from config import PROCESSED_DATA_DIR, FIGURES_DIR, REPORTS_DIR
 matplotlib.use('Agg')
 
 
@@ -19,6 +22,105 @@ class PlotData:
         
         self.input_path = input_path
         self.output_path = output_path
+        self.data = None
+
+        # Fingerprints of the aggregate behind each figure, stored with the figures
+        self.fingerprints_path = output_path / "figures_fingerprints.json"
+        self.fingerprints = json.loads(self.fingerprints_path.read_text()) if self.fingerprints_path.exists() else {}
+        self.summary = {"rendered": [], "skipped": [], "time_saved": 0.0}
+        self._started = {}
+
+
+    def _read(self) -> pd.DataFrame:
+        """
+        Reads the input CSV once and reuses it for all the figures.
+        """
+
+        if self.data is None:
+            self.data = pd.read_csv(self.input_path)
+
+        return self.data
+
+
+    def _up_to_date(self, filename: str, aggregate) -> bool:
+        """
+        Checks if a figure can be skipped because the aggregate it is drawn from has not changed.
+        The aggregate (e.g. the crosstab of a column) is hashed as CSV, so any change of a count,
+        category or column changes the fingerprint.
+        Args:
+            filename (str): Name of the PNG in `self.output_path`.
+            aggregate (pd.DataFrame | pd.Series): The data the figure is drawn from.
+        Returns:
+            bool: True if the PNG exists and its fingerprint matches, otherwise starts timing the render.
+        """
+
+        fingerprint = hashlib.sha256(aggregate.to_csv().encode()).hexdigest()
+        previous = self.fingerprints.get(filename, {})
+
+        if previous.get("fingerprint") == fingerprint and (self.output_path / filename).exists():
+            self.summary["skipped"].append(filename)
+            self.summary["time_saved"] += previous.get("render_time", 0.0)
+            return True
+
+        self._started[filename] = (fingerprint, time.perf_counter())
+        return False
+
+
+    def _record(self, filename: str):
+        """
+        Stores the fingerprint and render time of a figure that was just saved.
+        """
+
+        fingerprint, start = self._started.pop(filename)
+        self.fingerprints[filename] = {"fingerprint": fingerprint, 
+                                       "render_time": time.perf_counter() - start}
+        self.summary["rendered"].append(filename)
+
+
+    def save_fingerprints(self):
+        """
+        Writes the fingerprints next to the figures and prints how many figures were re-rendered.
+        """
+
+        self.fingerprints_path.write_text(json.dumps(self.fingerprints, indent=4))
+
+        rendered, skipped = len(self.summary["rendered"]), len(self.summary["skipped"])
+        print(f"{rendered} of {rendered + skipped} figures re-rendered, {skipped} unchanged "
+              f"(~{self.summary['time_saved']:.2f}s saved).")
+
+
+    @staticmethod
+    def _log_fit(rates: pd.DataFrame, keys: list = []) -> pd.DataFrame:
+        """
+        Least-squares fit of no_churn_rate = a + b * ln(tenure) for every group of `keys` at once.
+        The model is linear in a and b, so each fit has a closed form from the grouped sums of
+        1, u, u², y, y² and u*y (u = ln(tenure)), with no iterative optimizer. Tenure 0 is excluded.
+        Args:
+            rates (pd.DataFrame): One row per group and tenure, with 'tenure' and 'no_churn_rate'.
+            keys (list): Columns identifying a group, empty for a single fit.
+        Returns:
+            pd.DataFrame: One row per group with 'a', 'b', 'r2' and 'n_points' (NaN if fewer than 2 tenures).
+        """
+
+        points = rates[rates['tenure'] > 0]
+        u = np.log(points['tenure'].to_numpy(dtype=float))
+        y = points['no_churn_rate'].to_numpy(dtype=float)
+
+        sums = pd.DataFrame({'n': 1.0, 'su': u, 'suu': u * u, 'sy': y, 'syy': y * y, 'suy': u * y}, 
+                            index=points.index)
+        sums = sums.groupby([points[k] for k in keys] or np.zeros(len(points)), sort=False).sum()
+
+        det = sums['n'] * sums['suu'] - sums['su'] ** 2
+        b = (sums['n'] * sums['suy'] - sums['su'] * sums['sy']) / det.where(det > 0)
+        a = (sums['sy'] - b * sums['su']) / sums['n']
+
+        # R² from the same sums: SSE = Σy² - aΣy - bΣuy, SST = Σy² - (Σy)²/n
+        sse = sums['syy'] - a * sums['sy'] - b * sums['suy']
+        sst = sums['syy'] - sums['sy'] ** 2 / sums['n']
+        r2 = 1 - sse / sst.where(sst > 0)
+
+        fits = pd.DataFrame({'a': a, 'b': b, 'r2': r2, 'n_points': sums['n'].astype(int)})
+        return fits.reset_index() if keys else fits.reset_index(drop=True)
 
 
     def plot_rate_tenure_log_fit(self):
@@ -30,12 +132,16 @@ class PlotData:
             churn_rate_by_tenure_log_fit.png: The generated plot showing churn rates and the logarithmic fit.
         """
     
-        data = pd.read_csv(self.input_path)
+        data = self._read()
         # Convert 'churn' to binary values
-        data['churn_binary'] = data['churn'].apply(lambda x: 1 if str(x).lower() == 'yes' else 0)
+        churn_binary = data['churn'].apply(lambda x: 1 if str(x).lower() == 'yes' else 0)
         
         # Group by 'tenure' and calculate churn rates
-        churn_by_tenure = data.groupby('tenure')['churn_binary'].agg(['count', 'sum']).reset_index()
+        churn_by_tenure = churn_binary.groupby(data['tenure']).agg(['count', 'sum']).reset_index()
+
+        output_file = self.output_path / "churn_rate_by_tenure_log_fit.png"
+        if self._up_to_date(output_file.name, churn_by_tenure):
+            return
         
         # Calculate churn and no-churn rates
         churn_by_tenure['churn_rate'] = (churn_by_tenure['sum'] / churn_by_tenure['count']) * 100
@@ -46,9 +152,8 @@ class PlotData:
             return a + b * np.log(x)
         
         # Fit the logarithmic function to the no-churn rate
-        filtered_data = churn_by_tenure[churn_by_tenure['tenure'] > 0].copy()
-        params, _ = curve_fit(log_func, filtered_data['tenure'], filtered_data['no_churn_rate'])
-        x_values = np.linspace(1, filtered_data['tenure'].max(), 100)
+        params = self._log_fit(churn_by_tenure).loc[0, ['a', 'b']].to_numpy(dtype=float)
+        x_values = np.linspace(1, churn_by_tenure['tenure'].max(), 100)
         y_values = log_func(x_values, *params)
         
 
@@ -81,10 +186,86 @@ class PlotData:
         plt.tight_layout()
         
         # Save the figure
-        output_file = self.output_path / "churn_rate_by_tenure_log_fit.png"
         fig.savefig(output_file, bbox_inches='tight')
         
         plt.close(fig)
+        self._record(output_file.name)
+
+
+    def fit_tenure_log_segments(self, columns: list) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fits the no-churn rate by tenure, y = a + b * ln(x), for every level of every given column at once.
+        The churn counts by (column, level, tenure) are computed in one groupby, and all the fits are solved
+        together in closed form by `_log_fit`, instead of one `curve_fit` call per segment.
+        Args:
+            columns (list): Categorical columns to segment by, e.g. ['contract', 'internetservice', 'paymentmethod'].
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]:
+                - The no-churn rate by (column, segment, tenure), plotted by `plot_tenure_log_fit_segments`.
+                - One row per (column, segment) with the coefficients 'a' and 'b', 'r2' and 'n_points'.
+        """
+
+        data = self._read()
+        churn_binary = (data['churn'].astype(str).str.lower() == 'yes').astype(int)
+
+        # Long table of (column, segment, tenure, churn) for all the columns
+        segments = pd.concat([pd.DataFrame({'column': col, 
+                                            'segment': data[col].astype(str), 
+                                            'tenure': data['tenure'], 
+                                            'churn': churn_binary}) for col in columns])
+
+        rates = segments.groupby(['column', 'segment', 'tenure'])['churn'].agg(['count', 'sum']).reset_index()
+        rates['no_churn_rate'] = 100 - (rates['sum'] / rates['count']) * 100
+
+        return rates, self._log_fit(rates, keys=['column', 'segment'])
+
+
+    def plot_tenure_log_fit_segments(self, column: str, rates: pd.DataFrame, fits: pd.DataFrame):
+        """
+        Plots the no-churn rate by tenure and its logarithmic fit for each level of a column.
+        Args:
+            column (str): The segmenting column.
+            rates (pd.DataFrame): No-churn rates returned by `fit_tenure_log_segments`, including `column`.
+            fits (pd.DataFrame): Coefficients returned by `fit_tenure_log_segments`, including `column`.
+        Saves:
+            {column}_tenure_log_fit.png: One scatter and fitted curve per level of the column.
+        """
+
+        rates = rates[rates['column'] == column]
+        fits = fits[fits['column'] == column]
+
+        output_file = self.output_path / f"{column}_tenure_log_fit.png"
+        if self._up_to_date(output_file.name, rates):
+            return
+
+        fig, ax = plt.subplots(figsize=(15, 8))
+        x_values = np.linspace(1, rates['tenure'].max(), 100)
+
+        for (_, fit), color in zip(fits.iterrows(), itertools.cycle(plt.rcParams['axes.prop_cycle'].by_key()['color'])):
+            points = rates[(rates['segment'] == fit['segment']) & (rates['tenure'] > 0)]
+            ax.scatter(points['tenure'], 
+                       points['no_churn_rate'], 
+                       color=color, 
+                       alpha=0.4, 
+                       s=15)
+            ax.plot(x_values, 
+                    fit['a'] + fit['b'] * np.log(x_values), 
+                    color=color, 
+                    linewidth=2,
+                    label=f"{fit['segment']}: y = {fit['a']:.2f} + {fit['b']:.2f}*ln(x) (R² = {fit['r2']:.2f})")
+
+        ax.set_xlabel('Tenure (months)')
+        ax.set_ylabel('No Churn Rate (%)')
+        ax.set_title(f'No Churn Rate by Tenure with Logarithmic Fit per {column.title()}')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+
+        # Save the figure
+        fig.savefig(output_file, bbox_inches='tight')
+
+        plt.close(fig)
+        self._record(output_file.name)
 
 
     def plot_cat_vs_churn_multi_pies(self, column: str):
@@ -104,7 +285,7 @@ class PlotData:
         None. Displays the charts directly.
         """
         
-        data = pd.read_csv(self.input_path)
+        data = self._read()
         
         colors_pie = ['#4E79A7', '#F28E2B']
         colors_bar = ['#59A14F', '#E15759']
@@ -112,6 +293,11 @@ class PlotData:
         # Crosstabulate the data
         crosstab = pd.crosstab(data[column], 
                             data['churn'])
+        
+        output_file = self.output_path / f"{column}_churn_pie_bar.png"
+        if self._up_to_date(output_file.name, crosstab):
+            return
+
         n_cats = len(crosstab)
         n_cols = 2
         n_rows = (n_cats + n_cols - 1) // n_cols
@@ -192,9 +378,10 @@ class PlotData:
                             right=0.85)
 
         # Save the figure
-        fig.savefig(self.output_path / f"{column}_churn_pie_bar.png", bbox_inches='tight')
+        fig.savefig(output_file, bbox_inches='tight')
         
         plt.close(fig)
+        self._record(output_file.name)
 
 
     def plot_churn_distribution(self):
@@ -211,7 +398,7 @@ class PlotData:
                 Exception: For other errors during file reading or plotting.
             """
             # Read the data
-            data = pd.read_csv(self.input_path)
+            data = self._read()
 
             # Count the occurrences of each churn class
             count_churn = data['churn'].value_counts().reset_index()
@@ -221,7 +408,7 @@ class PlotData:
             colors_pie = ['#4E79A7', '#F28E2B']
             colors_bar = ['#59A14F', '#E15759']
 
-            # Define the style for the plots
+            # Define the style for the plots (set even when skipped, the figures drawn after it use it)
             sns.set_style("whitegrid")
             plt.rcParams.update({
                 'font.size': 12, 
@@ -229,6 +416,10 @@ class PlotData:
                 'axes.labelsize': 13
                 })
 
+            output_file = self.output_path / "churn_distribution.png"
+            if self._up_to_date(output_file.name, count_churn):
+                return
+
             # Figure setup
             fig, axes = plt.subplots(1, 2, figsize=(12, 6))
 
@@ -271,14 +462,15 @@ class PlotData:
             plt.tight_layout()
 
             # Save the figure
-            output_file = self.output_path / "churn_distribution.png"
             fig.savefig(output_file, bbox_inches='tight')
             plt.close(fig)
+            self._record(output_file.name)
 
 
 def main(
     input_path: Path = PROCESSED_DATA_DIR / "churn_clean_data.csv",
-    output_path: Path = FIGURES_DIR 
+    output_path: Path = FIGURES_DIR,
+    segments_path: Path = REPORTS_DIR / "tenure_log_fit_segments.csv"
 ):
     plot_data = PlotData(input_path, output_path)
     
@@ -293,6 +485,17 @@ def main(
         
     plot_data.plot_churn_distribution()
     plot_data.plot_rate_tenure_log_fit()
+
+    # Tenure log fit per segment
+    segment_cols = ['contract', 'internetservice', 'paymentmethod']
+    rates, fits = plot_data.fit_tenure_log_segments(segment_cols)
+    fits.to_csv(segments_path, index=False)
+    print(f"Tenure log fit coefficients of {fits.shape[0]} segments saved at {segments_path}")
+
+    for col in segment_cols:
+        plot_data.plot_tenure_log_fit_segments(col, rates, fits)
+
+    plot_data.save_fingerprints()
     
     
 
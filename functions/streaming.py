@@ -0,0 +1,275 @@
+### Imports ###
+import joblib
+import numpy as np
+import seaborn as sns
+import matplotlib.pyplot as plt
+from pathlib import Path
+from sklearn.metrics import classification_report
+
+from .config import PROCESSED_DATA_DIR, MODELS_DIR
+from .dataset import LoadDataset, CleanDataset
+from .features import FeatureEng
+
+
+
+class StreamingEvaluator:
+    """
+    A class to evaluate a classifier on a holdout of any size in constant memory.
+    The holdout is scored chunk by chunk, and only two things are accumulated:
+        - The confusion matrix of `model.predict`, which is exact.
+        - Histograms of the churn scores of the positives and of the negatives over `n_bins` fixed bins on [0, 1],
+          from which the ROC and Precision-Recall curves and their AUCs are computed.
+    Binning only loses the order of the scores that fall in the same bin, so the error of the AUCs is bounded
+    by the positives and negatives sharing a bin (see `roc_auc` and `average_precision`).
+    Args:
+        n_bins (int): Number of score bins. More bins give a tighter error bound for the same memory order.
+    Methods:
+        update(y_true, y_score, y_pred):
+            Accumulates a chunk.
+        evaluate(model, chunks) -> StreamingEvaluator:
+            Scores an iterable of (X, y) chunks.
+        roc_auc() -> tuple[float, float]:
+            ROC AUC and its error bound.
+        average_precision() -> tuple[float, float]:
+            PR AUC (average precision) and its error bound.
+        save(model_name, model_dir):
+            Saves the evaluation figure and report, like `TrainPredict.evaluate_model`.
+    """
+    def __init__(self, n_bins: int = 10_000):
+
+        self.n_bins = n_bins
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.positives = np.zeros(n_bins, dtype=np.int64)
+        self.negatives = np.zeros(n_bins, dtype=np.int64)
+
+    def update(self, y_true, y_score, y_pred):
+        """
+        Accumulates the confusion matrix and the score histograms of a chunk.
+        Args:
+            y_true (array-like): True labels (0/1).
+            y_score (array-like): Churn probabilities from `predict_proba(X)[:, 1]`.
+            y_pred (array-like): Predicted labels (0/1).
+        """
+
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        bins = np.clip((np.asarray(y_score, dtype=float) * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+
+        self.confusion += np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+        self.positives += np.bincount(bins, weights=y_true, minlength=self.n_bins).astype(np.int64)
+        self.negatives += np.bincount(bins, weights=1 - y_true, minlength=self.n_bins).astype(np.int64)
+
+    def evaluate(self, model, chunks):
+        """
+        Scores an iterable of chunks and accumulates them.
+        The predictions are taken from the argmax of `predict_proba`, which is what `predict` does, so the
+        model is only run once per chunk.
+        Args:
+            model (sklearn.base.BaseEstimator): Trained classifier with `predict_proba` and `classes_`.
+            chunks (iterable): Pairs (X, y) of engineered features and labels (0/1).
+        Returns:
+            StreamingEvaluator: The updated instance.
+        """
+
+        for X, y in chunks:
+            proba = model.predict_proba(X)
+            y_pred = model.classes_.take(np.argmax(proba, axis=1))
+            self.update(y, proba[:, 1], y_pred)
+
+        return self
+
+    def _cumulative(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        True and false positives when contacting every bin from the highest score down, starting at 0.
+        """
+
+        tp = np.r_[0, np.cumsum(self.positives[::-1])]
+        fp = np.r_[0, np.cumsum(self.negatives[::-1])]
+        return tp, fp
+
+    def roc_curve(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        False and true positive rates at every bin edge.
+        """
+
+        tp, fp = self._cumulative()
+        return fp / max(fp[-1], 1), tp / max(tp[-1], 1)
+
+    def precision_recall_curve(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Precision and recall at every bin edge holding at least one customer.
+        """
+
+        tp, fp = self._cumulative()
+        contacted = tp + fp
+        keep = contacted > 0
+        return tp[keep] / contacted[keep], tp[keep] / max(tp[-1], 1)
+
+    def roc_auc(self) -> tuple[float, float]:
+        """
+        ROC AUC from the trapezoids between bin edges.
+        The exact AUC counts each (positive, negative) pair as 1 if the positive scores higher, 0.5 if tied.
+        Binning gets every pair in different bins right and counts the pairs in the same bin as 0.5, so:
+            |error| <= 0.5 * sum_b(positives_b * negatives_b) / (P * N)
+        Returns:
+            tuple[float, float]: The AUC and its error bound.
+        """
+
+        fpr, tpr = self.roc_curve()
+        auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+        pairs = max(self.positives.sum() * self.negatives.sum(), 1)
+        bound = float(0.5 * np.sum(self.positives * self.negatives.astype(float)) / pairs)
+
+        return auc, bound
+
+    def average_precision(self) -> tuple[float, float]:
+        """
+        PR AUC as average precision, AP = sum_b(recall gained in bin b * precision after bin b), like scikit-learn.
+        Inside a bin, the precision seen by each positive depends on the order of the scores in the bin. With
+        (tp, fp) before the bin, the i-th positive after j negatives of the bin sees (tp + i) / (tp + fp + i + j),
+        which is monotone in i and j, so it is always between its values at the corners i in {1, positives_b}
+        and j in {0, negatives_b}. So:
+            |error| <= sum_b(recall gained in bin b * (max corner - min corner))
+        Returns:
+            tuple[float, float]: The average precision and its error bound.
+        """
+
+        tp, fp = self._cumulative()
+        total = max(tp[-1], 1)
+        pos, neg = self.positives[::-1], self.negatives[::-1]
+        before_tp, before_fp = tp[:-1], fp[:-1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            after = tp[1:] / (tp[1:] + fp[1:])
+            corners = np.stack([
+                (before_tp + 1) / (before_tp + before_fp + 1),
+                (before_tp + 1) / (before_tp + before_fp + 1 + neg),
+                (before_tp + pos) / (before_tp + before_fp + pos),
+                after
+            ])
+
+        recall_gain = pos / total
+        gained = pos > 0
+        ap = float(np.sum(recall_gain[gained] * after[gained]))
+        spread = np.nanmax(corners[:, gained], axis=0) - np.nanmin(corners[:, gained], axis=0)
+        bound = float(np.sum(recall_gain[gained] * spread))
+
+        return ap, bound
+
+    def save(self, model_name: str, model_dir: Path = MODELS_DIR):
+        """
+        Plots the confusion matrix, ROC curve and Precision-Recall curve, and writes the accuracy, AUCs with
+        their error bounds and the classification report, like `TrainPredict.evaluate_model`.
+        Saves:
+            {model_name}_streaming_evaluation.png and {model_name}_streaming_evaluation.txt in `model_dir`.
+        """
+
+        roc_auc, roc_bound = self.roc_auc()
+        ap, ap_bound = self.average_precision()
+
+        # Prepare the figure for plotting
+        fig, axes = plt.subplots(1, 3, figsize=(18, 4))
+
+        # Confusion matrix
+        sns.heatmap(self.confusion,
+                    annot=True,
+                    fmt="d",
+                    cmap="Blues",
+                    cbar=False,
+                    ax=axes[0])
+        axes[0].set_title(f'Confusion Matrix')
+        axes[0].set_xlabel("Prediction")
+        axes[0].set_ylabel("Real Value")
+
+        # ROC curve
+        fpr, tpr = self.roc_curve()
+        axes[1].plot(fpr,
+                    tpr,
+                    color='darkorange',
+                    label=f'AUC = {roc_auc:.2f}')
+        axes[1].plot([0, 1], [0, 1], color='navy', linestyle='--')
+        axes[1].set_xlabel('False Positive Rate')
+        axes[1].set_ylabel('True Positive Rate')
+        axes[1].set_title('ROC Curve')
+        axes[1].legend(loc="lower right")
+
+        # Precision-Recall curve
+        precision, recall = self.precision_recall_curve()
+        axes[2].plot(recall, precision, color='green')
+        axes[2].set_xlabel('Recall')
+        axes[2].set_ylabel('Precision')
+        axes[2].set_title('Precision-Recall Curve')
+        axes[2].grid()
+
+        plt.suptitle(model_name)
+        plt.tight_layout(rect=[0, 0.03, 1, 0.95]) # type: ignore
+        fig.savefig(model_dir / f"{model_name}_streaming_evaluation.png")
+        plt.close(fig)
+
+        acc = np.trace(self.confusion) / max(self.confusion.sum(), 1)
+
+        with open(model_dir / f"{model_name}_streaming_evaluation.txt", "w") as f:
+            f.write(f"Accuracy: {acc:.2f}\n")
+            f.write(f"ROC AUC: {roc_auc:.4f} (± {roc_bound:.4f})\n")
+            f.write(f"Average Precision: {ap:.4f} (± {ap_bound:.4f})\n\n")
+            f.write("Classification Report:\n")
+            f.write(self.classification_report())
+
+    def classification_report(self) -> str:
+        """
+        Classification report computed from the confusion matrix, in the layout of scikit-learn's.
+        """
+
+        # The report only needs the confusion matrix, passed as the weights of its 4 cells
+        scores = classification_report([0, 0, 1, 1],
+                                       [0, 1, 0, 1],
+                                       sample_weight=self.confusion.ravel(),
+                                       output_dict=True,
+                                       zero_division=0)
+
+        width = len("weighted avg")
+        lines = [f"{'':>{width}} " + "".join(f" {h:>9}" for h in ["precision", "recall", "f1-score", "support"]), ""]
+        for name in ["0", "1", "", "accuracy", "macro avg", "weighted avg"]:
+            if name == "":
+                lines.append("")
+            elif name == "accuracy":
+                lines.append(f"{name:>{width}}  {'':>9} {'':>9} {scores[name]:>9.2f} {self.confusion.sum():>9}")
+            else:
+                row = scores[name]
+                lines.append(f"{name:>{width}}  {row['precision']:>9.2f} {row['recall']:>9.2f} "
+                             f"{row['f1-score']:>9.2f} {int(row['support']):>9}")
+
+        return "\n".join(lines) + "\n"
+
+
+def main(
+    input_path: Path = PROCESSED_DATA_DIR / "churn_holdout.csv",
+    model_path: Path = MODELS_DIR / "rf_model.joblib",
+    categories_path: Path = MODELS_DIR / "feature_categories.joblib",
+    model_dir: Path = MODELS_DIR,
+    chunksize: int = 100_000,
+    n_bins: int = 10_000
+):
+    model = joblib.load(model_path)
+
+    # Every chunk is encoded with the levels of the training data, whatever levels it holds
+    featurizer = FeatureEng(categories=joblib.load(categories_path))
+
+    def chunks():
+        for chunk in LoadDataset().load(input_path, chunksize=chunksize):
+            y = chunk['Churn'].map({'No': 0, 'Yes': 1}).astype(int)
+            X = CleanDataset().clean(chunk.drop(columns=['Churn']), save=False)
+            X = featurizer.feature_eng(X)
+            yield X[model.feature_names_in_], y
+
+    evaluator = StreamingEvaluator(n_bins).evaluate(model, chunks())
+    evaluator.save("RandomForestClassifier", model_dir)
+
+    roc_auc, roc_bound = evaluator.roc_auc()
+    print(f"Streaming evaluation of {evaluator.confusion.sum()} rows: ROC AUC {roc_auc:.4f} (± {roc_bound:.4f}), "
+          f"saved in {model_dir}")
+
+
+if __name__ == "__main__":
+    main()
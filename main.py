@@ -5,8 +5,12 @@ import warnings
 import pandas as pd
 from pathlib import Path
 
-from functions.dataset import CleanDataset
+from functions.dataset import CleanDataset, LoadDataset
 from functions.features import FeatureEng
+from functions.decision import DecisionThreshold
+from functions.monitor import DriftMonitor
+from functions.manifest import RunManifest
+from functions.compress import CompressForest
 
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -35,15 +39,32 @@ class TrainPredict():
         processed_dir: Path = PROCESSED_DATA_DIR,  
         model_dir: Path = MODELS_DIR,
         test_size: float = 0.2, 
-        random_state: int = 42):
+        random_state: int = 42,
+        csv_engine: str = "c",
+        cost_per_contact: float = 10.0,
+        value_per_save: float = 100.0,
+        n_jobs: int = -1,
+        compress: bool = False,
+        auc_tolerance: float = 0.005):
         
         self.input_path = input_path
         self.processed_dir = processed_dir
         self.model_dir = model_dir
         self.test_size = test_size
         self.random_state = random_state
+        self.csv_engine = csv_engine
+        self.cost_per_contact = cost_per_contact
+        self.value_per_save = value_per_save
+        self.n_jobs = n_jobs
+        self.compress = compress
+        self.auc_tolerance = auc_tolerance
+        self.loader = LoadDataset
         self.cleaner = CleanDataset  
         self.featurizer = FeatureEng 
+        self.decision = DecisionThreshold
+        self.monitor = DriftMonitor
+        self.manifest = RunManifest
+        self.compressor = CompressForest
   
     def evaluate_model(self, 
                        model_name, 
@@ -134,19 +155,75 @@ class TrainPredict():
             3. Cleans and performs feature engineering on the training data.
             4. Transforms the target variable ('Churn') from categorical to binary.
             5. Balances the training data using SMOTE.
-            6. Cleans and performs feature engineering on the test data.
+            6. Cleans the test data and performs feature engineering on it with the levels of the training data.
             7. Transforms the test target variable to binary.
             8. Trains a RandomForestClassifier on the balanced training data.
             9. Evaluates the trained model on the test set.
             10. Saves the trained model to the specified model directory.
+            11. Picks the profit-maximizing decision threshold on the test set and saves it next to the model.
+            12. Saves the reference histograms of the raw training data used by the drift monitor, the levels of the
+                encoded columns of the training data and the raw rows of the test set as a holdout.
+            13. If `compress` is set, saves the smallest forest within `auc_tolerance` of the AUC of the full model.
+        Every step records its seed and outputs in `run_manifest.json`. The train, evaluate, decision and compress stages
+        are skipped when their inputs, config, seeds, source code and library versions match the previous run
+        and their outputs are unchanged.
         Prints information about dataset loading, data balancing, and model saving.
         Raises:
             FileNotFoundError: If the input dataset path does not exist.
             Exception: For errors during data processing, model training, or saving.
         """
 
+        #----- Run manifest -----#
+        # Every stage seed is derived from self.random_state, and stages whose dependencies are unchanged are skipped
+        manifest = self.manifest(
+            self.model_dir / "run_manifest.json",
+            self.random_state,
+            config={"input_path": self.input_path,
+                    "test_size": self.test_size,
+                    "csv_engine": self.csv_engine,
+                    "cost_per_contact": self.cost_per_contact,
+                    "value_per_save": self.value_per_save,
+                    "n_jobs": self.n_jobs,
+                    "compress": self.compress,
+                    "auc_tolerance": self.auc_tolerance}
+        )
+        manifest.add_input("raw_data", self.input_path)
+
+        # Source files run by the stages: this pipeline and the data preparation, plus the stage modules
+        code = [type(self), self.loader, self.cleaner, self.featurizer]
+
+        train_key = manifest.stage_key("train", 
+                                       config=["test_size"], 
+                                       seeds=["split", "smote", "forest"],
+                                       code=code + [self.monitor])
+        evaluate_key = manifest.stage_key("evaluate", 
+                                          config=["test_size"], 
+                                          seeds=["split"], 
+                                          code=code,
+                                          upstream=[train_key])
+        decision_key = manifest.stage_key("decision", 
+                                          config=["test_size", "cost_per_contact", "value_per_save"], 
+                                          seeds=["split", "decision"], 
+                                          code=code + [self.decision],
+                                          upstream=[train_key])
+        compress_key = manifest.stage_key("compress", 
+                                          config=["test_size", "auc_tolerance"], 
+                                          seeds=["split"], 
+                                          code=code + [self.compressor],
+                                          upstream=[train_key])
+
+        train_done = manifest.up_to_date("train", train_key)
+        evaluate_done = manifest.up_to_date("evaluate", evaluate_key)
+        decision_done = manifest.up_to_date("decision", decision_key)
+        compress_done = not self.compress or manifest.up_to_date("compress", compress_key)
+
+        if train_done and evaluate_done and decision_done and compress_done:
+            manifest.save()
+            print("All stages are up to date, nothing to run.")
+            return
+
         #----- Load the dataset -----#
-        data = pd.read_csv(self.input_path)      
+        data = self.loader(engine=self.csv_engine).load(self.input_path)
         print(f"Dataset loaded with {data.shape[0]} rows and {data.shape[1]} columns.")
         
         # Split the data into training and testing sets
@@ -157,53 +234,112 @@ class TrainPredict():
             X, 
             y, 
             test_size=self.test_size, 
-            random_state=self.random_state,
+            random_state=manifest.seed("split"),
             stratify=y
         )
 
-        #----- Process the training data -----#
-        X_train = self.cleaner().clean(X_train) 
+        # Raw rows of the test set, kept as the holdout of the streaming evaluation
+        holdout = data.loc[X_test.index]
 
-        # Feature Engineering
-        X_train = self.featurizer().feature_eng(X_train)
-
-        # Transform the target variable
-        y_train = y_train.map({'No': 0, 'Yes': 1})
-
-        
-        # Smote for balancing the dataset
-        smote = SMOTE(random_state=42)
-        X_train_bal, y_train_bal = smote.fit_resample(X_train, y_train) #type: ignore
-        print(f"Training data balanced: {X_train_bal.shape[0]} rows, {X_train_bal.shape[1]} columns.")
-        
         # #----- Process the test data -----#
+        # The cleaned test set is the one saved in the processed data directory, whether the train stage runs or not
         X_test = self.cleaner().clean(X_test)
 
-        # Feature Engineering
-        X_test = self.featurizer().feature_eng(X_test)
-
         # Transform the target variable
-        y_test = y_test.map({'No': 0, 'Yes': 1})
-        
-        #----- Train and Evaluate Model -----#
-        # ! The evaluation of all models is done in the same way, in notebooks/02_model_final, here i opted to use only one model.
-        rf_model = RandomForestClassifier(random_state=42)
-        rf_model.fit(X_train_bal, 
-                     y_train_bal)
-        
-        self.evaluate_model("RandomForestClassifier", 
-                            rf_model, 
-                            X_test, 
-                            y_test)
-        
-        # Save the model
+        y_test = y_test.map({'No': 0, 'Yes': 1}).astype(int)
+
         rf_model_path = self.model_dir / "rf_model.joblib"
+        monitor_path = self.model_dir / "drift_reference.joblib"
+        categories_path = self.model_dir / "feature_categories.joblib"
+        holdout_path = self.processed_dir / "churn_holdout.csv"
 
-        joblib.dump(rf_model, rf_model_path)
-        
-        print(f"Model and predictions saved at {rf_model_path}")
+        if train_done:
+            print(f"Stage 'train' is up to date, loading {rf_model_path}")
+            rf_model = joblib.load(rf_model_path)
+            categories = joblib.load(categories_path)
+        else:
+            #----- Process the training data -----#
+            # Reference histograms of the raw training data, to monitor the scoring batches
+            monitor = self.monitor().fit(X_train)
+
+            X_train = self.cleaner().clean(X_train, save=False) 
+
+            # Levels of the training data, to encode the scoring batches like it
+            categories = self.featurizer().fit_categories(X_train)
+
+            # Feature Engineering
+            X_train = self.featurizer().feature_eng(X_train)
+
+            # Transform the target variable
+            y_train = y_train.map({'No': 0, 'Yes': 1}).astype(int)
+
+            # Smote for balancing the dataset
+            smote = SMOTE(random_state=manifest.seed("smote"))
+            X_train_bal, y_train_bal = smote.fit_resample(X_train, y_train) #type: ignore
+            print(f"Training data balanced: {X_train_bal.shape[0]} rows, {X_train_bal.shape[1]} columns.")
+
+            #----- Train Model -----#
+            # ! The evaluation of all models is done in the same way, in notebooks/02_model_final, here i opted to use only one model.
+            rf_model = RandomForestClassifier(random_state=manifest.seed("forest"), 
+                                              n_jobs=self.n_jobs)
+            rf_model.fit(X_train_bal, 
+                         y_train_bal)
+            # The number of workers does not change the trees, drop it so the artifact hash does not depend on it
+            rf_model.set_params(n_jobs=None)
+
+            # Save the model
+            joblib.dump(rf_model, rf_model_path)
+            monitor.save(monitor_path)
+            joblib.dump(categories, categories_path)
+            holdout.to_csv(holdout_path, index=False)
+            manifest.record("train", train_key, [rf_model_path, monitor_path, categories_path, holdout_path])
+            print(f"Model saved at {rf_model_path}")
+
+        # Feature Engineering of the test set with the levels of the training data, as for the scoring batches
+        X_test = self.featurizer(categories=categories).feature_eng(X_test)
+        X_test = X_test[rf_model.feature_names_in_]
+
+        #----- Evaluate Model -----#
+        if evaluate_done:
+            print("Stage 'evaluate' is up to date, skipping.")
+        else:
+            self.evaluate_model("RandomForestClassifier", 
+                                rf_model, 
+                                X_test, 
+                                y_test)
+            manifest.record("evaluate", evaluate_key, [self.model_dir / "RandomForestClassifier_evaluation.png",
+                                                       self.model_dir / "RandomForestClassifier_evaluation.txt"])
+
+        #----- Profit-maximizing decision threshold -----#
+        if decision_done:
+            print("Stage 'decision' is up to date, skipping.")
+        else:
+            threshold_path = self.model_dir / "rf_threshold.joblib"
+            y_proba = rf_model.predict_proba(X_test)[:, 1]
+            decision = self.decision(cost_per_contact=self.cost_per_contact, 
+                                     value_per_save=self.value_per_save,
+                                     n_jobs=self.n_jobs,
+                                     random_state=manifest.seed("decision")).fit(y_test, y_proba)
+            decision.save(threshold_path)
+            manifest.record("decision", decision_key, [threshold_path])
+
+        #----- Smallest forest within auc_tolerance of the full model -----#
+        if compress_done:
+            if self.compress:
+                print("Stage 'compress' is up to date, skipping.")
+        else:
+            compressed_path = self.model_dir / "rf_model_compressed.joblib"
+            self.compressor(auc_tolerance=self.auc_tolerance).compress(rf_model, 
+                                                                       X_test, 
+                                                                       y_test, 
+                                                                       compressed_path)
+            manifest.record("compress", compress_key, [compressed_path])
+
+        manifest.save()
+        print(f"Run manifest saved at {manifest.path}")
         print("Pipeline completed successfully.")
 
+
 if __name__ == "__main__":
     trainer = TrainPredict()
     trainer.pipeline()
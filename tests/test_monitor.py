@@ -0,0 +1,49 @@
+import pandas as pd
+
+from functions.config import RAW_DATA_DIR
+from functions.dataset import LoadDataset
+from functions.monitor import DriftMonitor, BATCH_DTYPES, main
+
+
+RAW_PATH = RAW_DATA_DIR / "churn_raw_data.csv"
+
+
+def _corrupted_batch(path):
+    """
+    Writes the first 500 raw rows with empty SeniorCitizen/tenure values and garbage charges.
+    """
+
+    batch = pd.read_csv(RAW_PATH, nrows=500, dtype=str, keep_default_na=False)
+    batch.loc[:99, "SeniorCitizen"] = ""
+    batch.loc[100:199, "tenure"] = ""
+    batch.loc[200:299, "MonthlyCharges"] = "unknown"
+    batch.loc[300:399, "TotalCharges"] = "abc"
+    batch.to_csv(path, index=False)
+
+
+def test_corrupted_batch_flags_null_spikes(tmp_path):
+    monitor = DriftMonitor().fit(LoadDataset().load(RAW_PATH))
+    monitor.save(tmp_path / "drift_reference.joblib")
+    _corrupted_batch(tmp_path / "batch.csv")
+
+    for chunksize in [None, 2]:
+        main(tmp_path / "batch.csv", tmp_path / "drift_reference.joblib", tmp_path / "report.csv", chunksize)
+        report = pd.read_csv(tmp_path / "report.csv", index_col="column")
+
+        for col in ["SeniorCitizen", "tenure", "MonthlyCharges", "TotalCharges"]:
+            assert report.at[col, "null_spike"]
+            assert report.at[col, "drift"]
+        assert report.at["MonthlyCharges", "invalid_values"] == 100
+        assert report.at["TotalCharges", "invalid_values"] == 100
+        assert not report.at["gender", "null_spike"]
+
+
+def test_clean_batch_has_no_null_spike():
+    data = LoadDataset().load(RAW_PATH)
+    monitor = DriftMonitor().fit(data)
+    monitor.update(LoadDataset(dtypes=BATCH_DTYPES).load(RAW_PATH))
+
+    report = monitor.report()
+    assert not report["null_spike"].any()
+    assert not report["drift"].any()
+    assert (report["invalid_values"] == 0).all()